@@ -28,6 +28,10 @@ device = torch.device("cuda", 0)
 
 # Turning on when the image size does not change during training can speed up training
 cudnn.benchmark = True
+# Allow TF32 Tensor Core math for convolutions and matmuls on Ampere and newer GPUs
+torch.backends.cuda.matmul.allow_tf32 = True
+cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision("high")
 
 # Image magnification factor
 upscale_factor = 4
@@ -48,9 +52,26 @@ if mode == "train":
     valid_image_dir = '/ocean/projects/cis220070p/jshah2/div2k/valid_subset'
     
     test_image_dir = '/ocean/projects/cis220070p/jshah2/Set5/GTmod12'
+    # Degrade the test images with the (slow) Matlab-compatible bicubic resize instead of OpenCV,
+    # and take their Y channel from the float BGR image like `validate.py`.
+    # Note: With `False` the "Test" PSNR (also reported to NNI) is NOT comparable with `validate.py`, earlier runs
+    # or published results, which all use the Matlab-compatible `imgproc.imresize` like the training tiles made by
+    # `scripts/prepare_dataset.py`. Set to `True` whenever those numbers have to be compared
+    test_matlab_imresize = False
+
+    # LMDB databases created by `scripts/create_lmdb_dataset.py`, used instead of the image folders when set
+    train_lr_lmdb_path = ""
+    train_hr_lmdb_path = ""
+    valid_lr_lmdb_path = ""
+    valid_hr_lmdb_path = ""
 
     image_size = 41
     num_workers = 4
+    # How many batches every dataloader worker loads in advance
+    prefetch_factor = 4
+
+    # Decode JPEG images on the GPU with NVIDIA DALI, falls back to OpenCV if DALI is not installed
+    use_dali = True
 
     # Incremental training and migration training
     start_epoch = 0
@@ -12,45 +12,421 @@
 # limitations under the License.
 # ==============================================================================
 """Realize the function of dataset preparation."""
-import gc
+import collections
+import math
 import os
 import queue
+import random
+import tempfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, default_collate, get_worker_info
 from tqdm import tqdm
 
 import imgproc
 
+try:
+    import jpeg4py
+except ImportError:
+    jpeg4py = None
+
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+try:
+    from nvidia.dali import fn, types
+    from nvidia.dali.pipeline import Pipeline
+except ImportError:
+    fn = types = Pipeline = None
+
 __all__ = [
-    "TrainValidImageDataset", "TestImageDataset",
-    "PrefetchGenerator", "PrefetchDataLoader", "CPUPrefetcher", "CUDAPrefetcher",
+    "TrainValidImageDataset", "LMDBImageDataset", "TestImageDataset",
+    "CPUPrefetcher", "CUDAPrefetcher", "paired_collate", "seed_worker",
 ]
 
 
-class TrainValidImageDataset(Dataset):
+def _is_jpeg(image_file_name: str) -> bool:
+    return os.path.splitext(image_file_name)[1].lower() in (".jpg", ".jpeg")
+
+
+def _read_bgr_image(image_file_name: str) -> np.ndarray:
+    """Read an image in the same BGR uint8 layout as ``cv2.imread``.
+
+    Args:
+        image_file_name (str): Image file address.
+
+    Returns:
+        np.ndarray: Decoded image data.
+    """
+
+    with open(image_file_name, "rb") as f:
+        return _decode_bgr_image(f.read(), image_file_name)
+
+
+def _read_gray_image(image_file_name: str) -> np.ndarray:
+    """Read an image directly as a single channel uint8 grayscale (full range BT.601 luma) image.
+
+    Args:
+        image_file_name (str): Image file address.
+
+    Returns:
+        np.ndarray: Decoded image data.
+    """
+
+    with open(image_file_name, "rb") as f:
+        return _decode_gray_image(f.read(), image_file_name)
+
+
+def _decode_bgr_image(image_bytes: bytes, image_file_name: str) -> np.ndarray:
+    """Decode encoded image file contents in the same BGR uint8 layout as ``cv2.imread``.
+
+    JPEG images are decoded with the SIMD libjpeg-turbo decoder of ``jpeg4py`` when it is installed,
+    everything else (and every JPEG that ``jpeg4py`` fails to decode) goes through OpenCV.
+
+    Args:
+        image_bytes (bytes): Encoded image file contents.
+        image_file_name (str): Image file address, used to pick the decoder and in the error message.
+
+    Returns:
+        np.ndarray: Decoded image data.
+    """
+
+    image_buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+
+    if jpeg4py is not None and _is_jpeg(image_file_name):
+        try:
+            return cv2.cvtColor(jpeg4py.JPEG(image_buffer).decode(), cv2.COLOR_RGB2BGR)
+        except Exception:
+            # e.g. `libturbojpeg` is missing or the file is not a baseline JPEG
+            pass
+
+    image = cv2.imdecode(image_buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Can not read image `{image_file_name}`.")
+
+    return image
+
+
+def _decode_gray_image(image_bytes: bytes, image_file_name: str) -> np.ndarray:
+    """Decode encoded image file contents directly as a single channel uint8 grayscale (full range BT.601 luma) image.
+
+    Only meant for lossless formats. For JPEG files the decoder returns the encoded luma plane,
+    which differs from the luma of the clamped colour decode by tens of levels on saturated colours.
+
+    Args:
+        image_bytes (bytes): Encoded image file contents.
+        image_file_name (str): Image file address, only used in the error message.
+
+    Returns:
+        np.ndarray: Decoded image data.
+    """
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Can not read image `{image_file_name}`.")
+
+    return image
+
+
+class _PrefetchReader(threading.Thread):
+    """Read raw image file contents in a background thread, so disk I/O overlaps with decoding.
+
+    At most ``num_prefetch_queue`` file contents wait in the queue, the thread blocks until the consumer catches up.
+    Call ``close`` once the consumer stops early, so the thread does not block on the full queue forever.
+
+    Args:
+        image_file_names (list): Image file addresses, read in this order.
+        num_prefetch_queue (int): How many file contents are buffered ahead of the consumer.
+    """
+
+    def __init__(self, image_file_names: list, num_prefetch_queue: int) -> None:
+        threading.Thread.__init__(self)
+        self.queue = queue.Queue(num_prefetch_queue)
+        self.image_file_names = image_file_names
+        self.stop_event = threading.Event()
+        self.daemon = True
+        self.start()
+
+    def run(self) -> None:
+        for image_file_name in self.image_file_names:
+            try:
+                with open(image_file_name, "rb") as f:
+                    image_bytes = f.read()
+            except OSError as e:
+                # Re-raised by the consumer, otherwise it would wait forever
+                self._put(e)
+                return
+            if not self._put(image_bytes):
+                return
+        self._put(None)
+
+    def _put(self, item) -> bool:
+        # Give up once the consumer is gone instead of blocking on the full queue
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def close(self) -> None:
+        self.stop_event.set()
+
+    def __next__(self) -> bytes:
+        next_item = self.queue.get()
+        if next_item is None:
+            raise StopIteration
+        if isinstance(next_item, Exception):
+            raise next_item
+        return next_item
+
+    def __iter__(self):
+        return self
+
+
+# `imgproc.bgr2ycbcr(..., use_y_channel=True)` coefficients for [0, 255] input and output
+_BGR2Y_WEIGHTS = np.array([24.966, 128.553, 65.481], dtype=np.float32) / 255.
+
+# OpenCV grayscale is the full range BT.601 luma 0.299 R + 0.587 G + 0.114 B. Scaled by 219 / 255 and
+# offset by 16 these are exactly the `imgproc.bgr2ycbcr(..., use_y_channel=True)` coefficients
+_GRAY2Y_TABLE = np.clip(np.rint(np.arange(256) * (219. / 255.) + 16.), 0, 255).astype(np.uint8)
+
+
+def _bgr2y(image: np.ndarray) -> np.ndarray:
+    """Extract the uint8 Y channel of a uint8 BGR image.
+
+    Same result as ``imgproc.bgr2ycbcr(image / 255., use_y_channel=True)`` rounded back to uint8,
+    but as a single weighted sum over the channels without materializing the Cb and Cr planes.
+
+    Args:
+        image (np.ndarray): Image input in BGR format.
+
+    Returns:
+        np.ndarray: Y channel image data.
+    """
+
+    y_image = np.einsum("hwc,c->hw", image, _BGR2Y_WEIGHTS, dtype=np.float32)
+    y_image += 16.
+    np.rint(y_image, out=y_image)
+
+    return np.clip(y_image, 0, 255).astype(np.uint8)
+
+
+def _gray2y(image: np.ndarray) -> np.ndarray:
+    """Convert a uint8 grayscale image to the uint8 Y channel of `imgproc.bgr2ycbcr`.
+
+    The gray value is already rounded by the decoder and the table rounds again, so the result can be off by
+    more than one level from `_bgr2y` of the same image (up to 1.34 levels from the float Y measured on PNG).
+
+    Args:
+        image (np.ndarray): Grayscale image read by `_read_gray_image`.
+
+    Returns:
+        np.ndarray: Y channel image data.
+    """
+
+    return cv2.LUT(image, _GRAY2Y_TABLE)
+
+
+def _to_float_tensor(tensor: torch.Tensor) -> torch.Tensor:
+    # uint8 image batches are scaled to [0, 1] on the device they live on, float batches pass through
+    if tensor.dtype == torch.uint8:
+        return tensor.float().mul_(1. / 255.)
+
+    return tensor
+
+
+def _patch_to_tensor(image: np.ndarray) -> torch.Tensor:
+    # `from_numpy` shares memory with the array, so only the patch itself is copied: non-contiguous crops by
+    # `ascontiguousarray`, contiguous views into the read-only cache explicitly (`from_numpy` warns on those)
+    image = np.ascontiguousarray(image)
+    if not image.flags.writeable:
+        image = image.copy()
+
+    return torch.from_numpy(image)[None]
+
+
+def _worker_seed() -> int:
+    # Every dataloader worker gets a distinct seed from PyTorch, the main process uses the global one
+    worker_info = get_worker_info()
+
+    return worker_info.seed if worker_info is not None else torch.initial_seed()
+
+
+def seed_worker(worker_id: int) -> None:
+    """Seed the global `random` and `numpy` generators of a dataloader worker, use as ``worker_init_fn``.
+
+    Without this, forked workers start from the same global numpy state and produce correlated samples.
+
+    Args:
+        worker_id (int): Dataloader worker index.
+    """
+
+    worker_seed = torch.initial_seed() % 2 ** 32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
+
+
+def paired_collate(batch: list) -> dict:
+    """Collate ``{"lr", "hr"}`` samples into a single ``lr_hr`` tensor, use as ``collate_fn``.
+
+    The low-resolution samples come first and the high-resolution ones after them along the batch dimension,
+    so the batch is pinned and copied to the device in one piece and split back with ``chunk(2)``.
+
+    Args:
+        batch (list): Samples returned by the dataset, the lr and hr tensors must have the same shape.
+
+    Returns:
+        dict: Batch data.
+    """
+
+    return {"lr_hr": default_collate([sample["lr"] for sample in batch] + [sample["hr"] for sample in batch])}
+
+
+def _split_paired_batch(batch_data: dict) -> dict:
+    # Views into the `paired_collate` tensor, no data is copied
+    if "lr_hr" in batch_data:
+        batch_data["lr"], batch_data["hr"] = batch_data.pop("lr_hr").chunk(2)
+
+    return batch_data
+
+
+class _MemmapImageCache:
+    """Read-only uint8 image cache backed by a single memory-mapped file.
+
+    When all images share one shape they are stored as one contiguous ``(N, H, W)`` array and the i-th image is just
+    ``cache[i]``. Otherwise they are stored back to back and ``offsets``/``shapes`` locate every image.
+    The file is mapped lazily in every process that reads from it, so the dataloader workers share the pages.
+
+    Args:
+        images (list): The uint8 images to cache.
+    """
+
+    def __init__(self, images: list) -> None:
+        self.shapes = [image.shape for image in images]
+        self.offsets = np.cumsum([0] + [image.size for image in images])
+        # One shape for the whole set, the (N, H, W) layout can be used
+        self.uniform = len(set(self.shapes)) == 1
+
+        # Removed automatically once the cache of the main process is garbage collected
+        self.cache_file = tempfile.NamedTemporaryFile(prefix="vdsr_cache_", suffix=".bin")
+        self.cache_file_name = self.cache_file.name
+
+        cache = np.memmap(self.cache_file_name, dtype=np.uint8, mode="w+", shape=self._cache_shape())
+        for index, image in enumerate(images):
+            if self.uniform:
+                cache[index] = image
+            else:
+                cache[self.offsets[index]:self.offsets[index + 1]] = image.ravel()
+        cache.flush()
+        del cache
+
+        self.cache = None
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if self.cache is None:
+            self.cache = np.memmap(self.cache_file_name, dtype=np.uint8, mode="r", shape=self._cache_shape())
+
+        # Read-only views into the mapping, the per-sample crops only slice them
+        if self.uniform:
+            return self.cache[index]
+
+        return self.cache[self.offsets[index]:self.offsets[index + 1]].reshape(self.shapes[index])
+
+    def __len__(self) -> int:
+        return len(self.shapes)
+
+    def __getstate__(self) -> dict:
+        # Worker processes map the file by name, only the main process owns (and deletes) it
+        state = self.__dict__.copy()
+        state["cache"] = None
+        state["cache_file"] = None
+
+        return state
+
+    def _cache_shape(self) -> tuple:
+        if self.uniform:
+            return (len(self.shapes),) + self.shapes[0]
+
+        # A memory map can not be empty
+        return max(int(self.offsets[-1]), 1),
+
+
+class _PairedPatchDataset(Dataset):
+    """Shared cropping and tensor conversion of the low/high resolution Y channel patch datasets.
+
+    Args:
+        image_size (int): High resolution image size.
+        mode (str): Data set loading method, the training data set is for data enhancement, and the verification data set is not for data enhancement.
+    """
+
+    def __init__(self, image_size: int, mode: str) -> None:
+        super(_PairedPatchDataset, self).__init__()
+        # Specify the high-resolution image size, with equal length and width
+        self.image_size = image_size
+        # Load training dataset or test dataset
+        self.mode = mode
+        # Per worker random number generator of the data augmentation
+        self.rng = None
+        self.rng_seed = None
+
+    def _crop_to_tensors(self, lr_y_image: np.ndarray, hr_y_image: np.ndarray) -> dict:
+        if self.mode == "Train":
+            # Data augment. Only the crop runs per sample, rotations and flips are applied to the
+            # whole batch by `CUDAPrefetcher(..., augment=True)` or `CPUPrefetcher(..., augment=True)`
+            lr_y_image, hr_y_image = imgproc.random_crop(lr_y_image, hr_y_image, self.image_size, rng=self._get_rng())
+        elif self.mode == "Valid":
+            lr_y_image, hr_y_image = imgproc.center_crop(lr_y_image, hr_y_image, self.image_size)
+        else:
+            raise ValueError("Unsupported data processing model, please use `Train` or `Valid`.")
+
+        # Convert image data into uint8 Tensor stream format (PyTorch).
+        # Note: The prefetcher scales the batch to [0, 1] after the host to device copy
+        lr_y_tensor = _patch_to_tensor(lr_y_image)
+        hr_y_tensor = _patch_to_tensor(hr_y_image)
+
+        return {"lr": lr_y_tensor, "hr": hr_y_tensor}
+
+    def _get_rng(self) -> np.random.Generator:
+        # Created lazily in every worker process, so the workers never share a random stream
+        seed = _worker_seed()
+        if self.rng_seed != seed:
+            self.rng = np.random.default_rng(seed)
+            self.rng_seed = seed
+
+        return self.rng
+
+
+class TrainValidImageDataset(_PairedPatchDataset):
     """Customize the data set loading function and prepare low/high resolution image data in advance.
 
+    In ``Train`` mode only the random crop happens here. The random rotations and flips are applied per batch,
+    so the dataloader has to be wrapped in `CUDAPrefetcher` or `CPUPrefetcher` with ``augment=True``.
+
     Args:
         image_dir (str): Train/Valid dataset address.
         image_size (int): High resolution image size.
         mode (str): Data set loading method, the training data set is for data enhancement, and the verification data set is not for data enhancement.
+        use_dali (optional, bool): Decode JPEG images on the GPU with NVIDIA DALI (nvJPEG) when it is installed. Default: ``False``.
     """
 
-    def __init__(self, image_dir: str, image_size: int, mode: str) -> None:
-        super(TrainValidImageDataset, self).__init__()
+    def __init__(self, image_dir: str, image_size: int, mode: str, use_dali: bool = False) -> None:
+        super(TrainValidImageDataset, self).__init__(image_size, mode)
         # Get all image file names in folder
         self.lr_image_file_names = [os.path.join(image_dir, "lr", image_file_name) for image_file_name in os.listdir(os.path.join(image_dir, "lr"))]
         self.hr_image_file_names = [os.path.join(image_dir, "hr", image_file_name) for image_file_name in os.listdir(os.path.join(image_dir, "hr"))]
-        # Specify the high-resolution image size, with equal length and width
-        self.image_size = image_size
-        # Load training dataset or test dataset
-        self.mode = mode
+        # Only use DALI if it is actually installed
+        self.use_dali = use_dali and Pipeline is not None
 
-        # Contains low-resolution and high-resolution image Tensor data
+        # Contains low-resolution and high-resolution uint8 Y channel image data
         self.lr_datasets = []
         self.hr_datasets = []
 
@@ -62,64 +438,187 @@ class TrainValidImageDataset(Dataset):
         lr_y_image = self.lr_datasets[batch_index]
         hr_y_image = self.hr_datasets[batch_index]
 
-        if self.mode == "Train":
-            # Data augment
-            try:
-                lr_y_image, hr_y_image = imgproc.random_crop(lr_y_image, hr_y_image, self.image_size)
-            except Exception as e:
-                print(batch_index, lr_y_image)
-            lr_y_image, hr_y_image = imgproc.random_rotate(lr_y_image, hr_y_image, angles=[0, 90, 180, 270])
-            lr_y_image, hr_y_image = imgproc.random_horizontally_flip(lr_y_image, hr_y_image, p=0.5)
-            lr_y_image, hr_y_image = imgproc.random_vertically_flip(lr_y_image, hr_y_image, p=0.5)
-        elif self.mode == "Valid":
-            lr_y_image, hr_y_image = imgproc.center_crop(lr_y_image, hr_y_image, self.image_size)
-        else:
-            raise ValueError("Unsupported data processing model, please use `Train` or `Valid`.")
-
-        # Convert image data into Tensor stream format (PyTorch).
-        # Note: The range of input and output is between [0, 1]
-        lr_y_tensor = imgproc.image2tensor(lr_y_image, range_norm=False, half=False)
-        hr_y_tensor = imgproc.image2tensor(hr_y_image, range_norm=False, half=False)
-
-        return {"lr": lr_y_tensor, "hr": hr_y_tensor}
+        return self._crop_to_tensors(lr_y_image, hr_y_image)
 
     def __len__(self) -> int:
         return len(self.lr_image_file_names)
 
     def read_image_to_memory(self) -> None:
-        lr_progress_bar = tqdm(self.lr_image_file_names,
-                               total=len(self.lr_image_file_names),
-                               unit="image",
-                               desc=f"Read lr dataset into memory")
+        if self.use_dali:
+            # JPEG images are decoded by nvJPEG, the rest still go through OpenCV
+            lr_y_images = self._read_y_images_with_dali(self.lr_image_file_names, desc="Read lr dataset into memory")
+            hr_y_images = self._read_y_images_with_dali(self.hr_image_file_names, desc="Read hr dataset into memory")
+        else:
+            lr_y_images = self._read_y_images(self.lr_image_file_names, desc="Read lr dataset into memory")
+            hr_y_images = self._read_y_images(self.hr_image_file_names, desc="Read hr dataset into memory")
+
+        self._check_image_shapes(lr_y_images, hr_y_images)
+
+        # Move the images into memory-mapped files, so every dataloader worker reads the same physical pages
+        # instead of duplicating the touched parts of per-process Python lists
+        self.lr_datasets = _MemmapImageCache(lr_y_images)
+        self.hr_datasets = _MemmapImageCache(hr_y_images)
+
+    def _check_image_shapes(self, lr_y_images: list, hr_y_images: list) -> None:
+        # Fail at load time rather than inside a dataloader worker
+        if len(lr_y_images) != len(hr_y_images):
+            raise ValueError(f"Found {len(lr_y_images)} low-resolution and {len(hr_y_images)} high-resolution images, they must be paired.")
+
+        for lr_image_file_name, lr_y_image, hr_y_image in zip(self.lr_image_file_names, lr_y_images, hr_y_images):
+            if lr_y_image.shape != hr_y_image.shape:
+                raise ValueError(f"`{lr_image_file_name}` has shape {lr_y_image.shape}, "
+                                 f"but its high-resolution image has shape {hr_y_image.shape}.")
+            if min(lr_y_image.shape[:2]) < self.image_size:
+                raise ValueError(f"`{lr_image_file_name}` with shape {lr_y_image.shape} is smaller than `image_size` {self.image_size}.")
+
+    @staticmethod
+    def _decode_y_image(image_bytes: bytes, image_file_name: str) -> np.ndarray:
+        # Cache uint8 data, a quarter of the float32 footprint. Scaling back to [0, 1] happens at tensor time
+        if _is_jpeg(image_file_name):
+            # The JPEG luma plane is not the luma of the clamped BGR decode, take Y from the colour image
+            return _bgr2y(_decode_bgr_image(image_bytes, image_file_name))
+
+        # Lossless formats only decode the luma and map it to the Y channel
+        return _gray2y(_decode_gray_image(image_bytes, image_file_name))
+
+    def _read_y_images(self, image_file_names: list, desc: str) -> list:
+        # One thread streams the file contents from disk while the pool decodes them. OpenCV releases
+        # the GIL while decoding, so the images are decoded on all cores at once.
+        # Futures are submitted through a bounded window and collected in submission order, so the results keep
+        # the order of the file names and at most `2 * num_workers` contents wait for a decoder, the rest stay
+        # in the bounded queue of the reader (`executor.map` would drain the reader up front)
+        num_workers = os.cpu_count() or 1
+        reader = _PrefetchReader(image_file_names, num_prefetch_queue=2 * num_workers)
+        progress_bar = tqdm(total=len(image_file_names), unit="image", desc=desc)
+
+        y_images = []
+        pending = collections.deque()
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                for image_bytes, image_file_name in zip(reader, image_file_names):
+                    pending.append(executor.submit(self._decode_y_image, image_bytes, image_file_name))
+                    if len(pending) >= 2 * num_workers:
+                        y_images.append(pending.popleft().result())
+                        progress_bar.update(1)
+
+                while pending:
+                    y_images.append(pending.popleft().result())
+                    progress_bar.update(1)
+        finally:
+            # Unblock the reader if decoding failed half way
+            reader.close()
+            progress_bar.close()
+
+        return y_images
+
+    def _read_y_images_with_dali(self, image_file_names: list, desc: str, batch_size: int = 64) -> list:
+        y_images = [None] * len(image_file_names)
+
+        jpeg_indices = [index for index, image_file_name in enumerate(image_file_names) if _is_jpeg(image_file_name)]
+        jpeg_index_set = set(jpeg_indices)
+
+        progress_bar = tqdm(total=len(jpeg_indices), unit="image", desc=desc)
+
+        if jpeg_indices:
+            # Fused JPEG decode + BT.601 color space conversion on the GPU, the uint8 Y channel of
+            # the output matches the cached `imgproc.bgr2ycbcr(..., use_y_channel=True)` data
+            pipe = Pipeline(batch_size=batch_size, num_threads=4, device_id=torch.cuda.current_device())
+            with pipe:
+                jpegs, _ = fn.readers.file(files=[image_file_names[index] for index in jpeg_indices],
+                                           random_shuffle=False,
+                                           pad_last_batch=True,
+                                           name="Reader")
+                images = fn.decoders.image(jpegs, device="mixed", output_type=types.YCbCr)
+                pipe.set_outputs(images)
+            pipe.build()
+
+            position = 0
+            for _ in range(math.ceil(len(jpeg_indices) / batch_size)):
+                images, = pipe.run()
+                images = images.as_cpu()
+                # The last batch is padded by repeating the last sample
+                for sample_index in range(min(batch_size, len(jpeg_indices) - position)):
+                    y_images[jpeg_indices[position]] = np.array(images.at(sample_index))[..., 0]
+                    position += 1
+                    progress_bar.update(1)
+            del pipe
+
+        progress_bar.close()
+
+        # Fall back to the CPU path for PNG and the other formats
+        other_indices = [index for index in range(len(image_file_names)) if index not in jpeg_index_set]
+        if other_indices:
+            other_y_images = self._read_y_images([image_file_names[index] for index in other_indices], desc=desc)
+            for index, y_image in zip(other_indices, other_y_images):
+                y_images[index] = y_image
+
+        return y_images
+
+
+class LMDBImageDataset(_PairedPatchDataset):
+    """Read low/high resolution Y channel tiles from LMDB databases created by `scripts/create_lmdb_dataset.py`.
+
+    In ``Train`` mode only the random crop happens here. The random rotations and flips are applied per batch,
+    so the dataloader has to be wrapped in `CUDAPrefetcher` or `CPUPrefetcher` with ``augment=True``.
 
-        for lr_image_file_name in lr_progress_bar:
-            # Disabling garbage collection after for loop helps speed things up
-            gc.disable()
+    Args:
+        lr_lmdb_path (str): Low-resolution lmdb database address.
+        hr_lmdb_path (str): High-resolution lmdb database address.
+        image_size (int): High resolution image size.
+        mode (str): Data set loading method, the training data set is for data enhancement, and the verification data set is not for data enhancement.
+    """
 
-            lr_image = cv2.imread(lr_image_file_name, cv2.IMREAD_UNCHANGED).astype(np.float32) / 255.
-            # Only extract the image data of the Y channel
-            lr_y_image = imgproc.bgr2ycbcr(lr_image, use_y_channel=True)
-            self.lr_datasets.append(lr_y_image)
+    def __init__(self, lr_lmdb_path: str, hr_lmdb_path: str, image_size: int, mode: str) -> None:
+        super(LMDBImageDataset, self).__init__(image_size, mode)
+        if lmdb is None:
+            raise ImportError("`LMDBImageDataset` requires the `lmdb` package, please install it with `pip install lmdb`.")
 
-            # After executing append, you need to turn on garbage collection again
-            gc.enable()
+        self.lr_lmdb_path = lr_lmdb_path
+        self.hr_lmdb_path = hr_lmdb_path
 
-        hr_progress_bar = tqdm(self.hr_image_file_names,
-                               total=len(self.hr_image_file_names),
-                               unit="image",
-                               desc=f"Read hr dataset into memory")
+        # Only read the metadata here, the environments are opened lazily in every worker process
+        lr_num_images, lr_tile_size = self._read_metadata(self.lr_lmdb_path)
+        self.num_images, self.tile_size = self._read_metadata(self.hr_lmdb_path)
+        if (lr_num_images, lr_tile_size) != (self.num_images, self.tile_size):
+            raise ValueError(f"`{self.lr_lmdb_path}` holds {lr_num_images} tiles of size {lr_tile_size}, "
+                             f"but `{self.hr_lmdb_path}` holds {self.num_images} tiles of size {self.tile_size}.")
+        if self.tile_size < self.image_size:
+            raise ValueError(f"The lmdb tile size {self.tile_size} is smaller than `image_size` {self.image_size}.")
 
-        for hr_image_file_name in hr_progress_bar:
-            # Disabling garbage collection after for loop helps speed things up
-            gc.disable()
+        self.lr_env = None
+        self.hr_env = None
 
-            hr_image = cv2.imread(hr_image_file_name, cv2.IMREAD_UNCHANGED).astype(np.float32) / 255.
-            # Only extract the image data of the Y channel
-            hr_y_image = imgproc.bgr2ycbcr(hr_image, use_y_channel=True)
-            self.hr_datasets.append(hr_y_image)
+    def __getitem__(self, batch_index: int) -> [torch.Tensor, torch.Tensor]:
+        if self.lr_env is None:
+            self._open_lmdb()
 
-            # After executing append, you need to turn on garbage collection again
-            gc.enable()
+        # Read a batch of image data
+        key = f"{batch_index:08d}".encode("ascii")
+        with self.lr_env.begin(buffers=True) as lr_txn, self.hr_env.begin(buffers=True) as hr_txn:
+            # Read-only views into the memory maps, only valid inside the transactions.
+            # Crop there, so only the patch is copied out of the tile
+            lr_y_image = np.frombuffer(lr_txn.get(key), dtype=np.uint8).reshape(self.tile_size, self.tile_size)
+            hr_y_image = np.frombuffer(hr_txn.get(key), dtype=np.uint8).reshape(self.tile_size, self.tile_size)
+
+            return self._crop_to_tensors(lr_y_image, hr_y_image)
+
+    def __len__(self) -> int:
+        return self.num_images
+
+    @staticmethod
+    def _read_metadata(lmdb_path: str) -> [int, int]:
+        env = lmdb.open(lmdb_path, readonly=True, lock=False, readahead=False, meminit=False)
+        with env.begin() as txn:
+            num_images = int(txn.get(b"__len__"))
+            tile_size = int(txn.get(b"__image_size__"))
+        env.close()
+
+        return num_images, tile_size
+
+    def _open_lmdb(self) -> None:
+        # Read-only and lock-free, the memory map is shared by all the worker processes
+        self.lr_env = lmdb.open(self.lr_lmdb_path, readonly=True, lock=False, readahead=False, meminit=False)
+        self.hr_env = lmdb.open(self.hr_lmdb_path, readonly=True, lock=False, readahead=False, meminit=False)
 
 
 class TestImageDataset(Dataset):
@@ -128,14 +627,19 @@ class TestImageDataset(Dataset):
     Args:
         test_image_dir (str): Test dataset address for high resolution image dir.
         upscale_factor (int): Image up scale factor.
+        use_matlab_imresize (optional, bool): Degrade the images with the Matlab-compatible bicubic `imgproc.imresize`
+            instead of OpenCV, and take the Y channel from the float BGR image with `imgproc.bgr2ycbcr`.
+            Required for PSNR parity with `validate.py`, the training tiles and published results,
+            the OpenCV degradation gives slightly different PSNR. Default: ``False``.
     """
 
-    def __init__(self, test_image_dir: str, upscale_factor: int) -> None:
+    def __init__(self, test_image_dir: str, upscale_factor: int, use_matlab_imresize: bool = False) -> None:
         super(TestImageDataset, self).__init__()
         # Get all image file names in folder
         self.image_file_names = [os.path.join(test_image_dir, x) for x in os.listdir(test_image_dir)]
         # How many times the high-resolution image is the low-resolution image
         self.upscale_factor = upscale_factor
+        self.use_matlab_imresize = use_matlab_imresize
 
         # Contains low-resolution and high-resolution image Tensor data
         self.lr_datasets = []
@@ -155,82 +659,47 @@ class TestImageDataset(Dataset):
         return len(self.image_file_names)
 
     def read_image_to_memory(self) -> None:
-        progress_bar = tqdm(self.image_file_names,
-                            total=len(self.image_file_names),
-                            unit="image",
-                            desc=f"Read test dataset into memory")
+        # Decode and degrade the test images on all cores at once, `map` keeps the original order
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            y_tensors = list(tqdm(executor.map(self._read_y_tensors, self.image_file_names),
+                                  total=len(self.image_file_names),
+                                  unit="image",
+                                  desc=f"Read test dataset into memory"))
 
-        for image_file_name in progress_bar:
-            # Disabling garbage collection after for loop helps speed things up
-            gc.disable()
+        self.lr_datasets = [lr_y_tensor for lr_y_tensor, _ in y_tensors]
+        self.hr_datasets = [hr_y_tensor for _, hr_y_tensor in y_tensors]
 
-            # Read a batch of image data
-            hr_image = cv2.imread(image_file_name, cv2.IMREAD_UNCHANGED).astype(np.float32) / 255.
+    def _read_y_tensors(self, image_file_name: str) -> [torch.Tensor, torch.Tensor]:
+        # Read a batch of image data
+        if self.use_matlab_imresize or _is_jpeg(image_file_name):
+            # Same float BGR to Y conversion as `validate.py`. Also the JPEG luma plane is not
+            # the luma of the clamped BGR decode, so JPEG images always take Y from the colour image
+            hr_image = imgproc.bgr2ycbcr(_read_bgr_image(image_file_name).astype(np.float32) / 255., use_y_channel=True)
+        else:
+            # Only the luma is decoded and mapped to the Y channel,
+            # which is linear in it and therefore commutes with the (linear) resize
+            hr_image = _read_gray_image(image_file_name).astype(np.float32)
+            hr_image = (hr_image * (219. / 255.) + 16.) / 255.
 
-            # Use high-resolution image to make low-resolution image
+        # Use high-resolution image to make low-resolution image
+        if self.use_matlab_imresize:
             lr_image = imgproc.imresize(hr_image, 1 / self.upscale_factor)
             lr_image = imgproc.imresize(lr_image, self.upscale_factor)
+        else:
+            hr_image_height, hr_image_width = hr_image.shape[:2]
+            lr_image_size = (math.ceil(hr_image_width / self.upscale_factor), math.ceil(hr_image_height / self.upscale_factor))
+            lr_image = cv2.resize(hr_image, lr_image_size, interpolation=cv2.INTER_AREA)
+            lr_image = cv2.resize(lr_image, (hr_image_width, hr_image_height), interpolation=cv2.INTER_CUBIC)
 
-            # Only extract the image data of the Y channel
-            lr_y_image = imgproc.bgr2ycbcr(lr_image, use_y_channel=True)
-            hr_y_image = imgproc.bgr2ycbcr(hr_image, use_y_channel=True)
-
-            # Convert image data into Tensor stream format (PyTorch).
-            # Note: The range of input and output is between [0, 1]
-            lr_y_tensor = imgproc.image2tensor(lr_y_image, range_norm=False, half=False)
-            hr_y_tensor = imgproc.image2tensor(hr_y_image, range_norm=False, half=False)
-
-            self.lr_datasets.append(lr_y_tensor)
-            self.hr_datasets.append(hr_y_tensor)
-
-            # After executing append, you need to turn on garbage collection again
-            gc.enable()
-
-
-class PrefetchGenerator(threading.Thread):
-    """A fast data prefetch generator.
-
-    Args:
-        generator: Data generator.
-        num_data_prefetch_queue (int): How many early data load queues.
-    """
-
-    def __init__(self, generator, num_data_prefetch_queue: int) -> None:
-        threading.Thread.__init__(self)
-        self.queue = queue.Queue(num_data_prefetch_queue)
-        self.generator = generator
-        self.daemon = True
-        self.start()
-
-    def run(self) -> None:
-        for item in self.generator:
-            self.queue.put(item)
-        self.queue.put(None)
-
-    def __next__(self):
-        next_item = self.queue.get()
-        if next_item is None:
-            raise StopIteration
-        return next_item
-
-    def __iter__(self):
-        return self
-
-
-class PrefetchDataLoader(DataLoader):
-    """A fast data prefetch dataloader.
-
-    Args:
-        num_data_prefetch_queue (int): How many early data load queues.
-        kwargs (dict): Other extended parameters.
-    """
+        lr_y_image = np.ascontiguousarray(lr_image, dtype=np.float32)
+        hr_y_image = hr_image
 
-    def __init__(self, num_data_prefetch_queue: int, **kwargs) -> None:
-        self.num_data_prefetch_queue = num_data_prefetch_queue
-        super(PrefetchDataLoader, self).__init__(**kwargs)
+        # Convert image data into Tensor stream format (PyTorch) without copying.
+        # Note: The range of input and output is between [0, 1]
+        lr_y_tensor = torch.from_numpy(lr_y_image)[None]
+        hr_y_tensor = torch.from_numpy(hr_y_image)[None]
 
-    def __iter__(self):
-        return PrefetchGenerator(super().__iter__(), self.num_data_prefetch_queue)
+        return lr_y_tensor, hr_y_tensor
 
 
 class CPUPrefetcher:
@@ -238,18 +707,31 @@ class CPUPrefetcher:
 
     Args:
         dataloader (DataLoader): Data loader. Combines a dataset and a sampler, and provides an iterable over the given dataset.
+        augment (optional, bool): Randomly rotate and flip every ``lr``/``hr`` batch. Default: ``False``.
     """
 
-    def __init__(self, dataloader) -> None:
+    def __init__(self, dataloader, augment: bool = False) -> None:
         self.original_dataloader = dataloader
+        self.augment = augment
         self.data = iter(dataloader)
 
     def next(self):
         try:
-            return next(self.data)
+            batch_data = next(self.data)
         except StopIteration:
             return None
 
+        for k, v in batch_data.items():
+            if torch.is_tensor(v):
+                batch_data[k] = _to_float_tensor(v)
+
+        batch_data = _split_paired_batch(batch_data)
+
+        if self.augment:
+            batch_data["lr"], batch_data["hr"] = imgproc.random_rotate_flip_batch(batch_data["lr"], batch_data["hr"])
+
+        return batch_data
+
     def reset(self):
         self.data = iter(self.original_dataloader)
 
@@ -260,39 +742,91 @@ class CPUPrefetcher:
 class CUDAPrefetcher:
     """Use the CUDA side to accelerate data reading.
 
+    Up to ``num_prefetch_batches`` batches are copied ahead, each one on its own CUDA stream and tagged with an event
+    that the compute stream waits on, so the next copy is already in flight while the current batch is consumed.
+
+    Batches built by `paired_collate` are transferred with a single copy instead of one per tensor.
+
+    The host to device copies only overlap with compute when the dataloader is built with ``pin_memory=True``,
+    otherwise ``non_blocking=True`` silently falls back to a synchronous copy from pageable memory.
+
     Args:
         dataloader (DataLoader): Data loader. Combines a dataset and a sampler, and provides an iterable over the given dataset.
         device (torch.device): Specify running device.
+        augment (optional, bool): Randomly rotate and flip every ``lr``/``hr`` batch on the device. Default: ``False``.
+        num_prefetch_batches (optional, int): How many batches are loaded onto the device in advance. Default: 2.
     """
 
-    def __init__(self, dataloader, device: torch.device):
-        self.batch_data = None
+    def __init__(self, dataloader, device: torch.device, augment: bool = False, num_prefetch_batches: int = 2):
+        if num_prefetch_batches < 1:
+            raise ValueError(f"`num_prefetch_batches` must be at least 1, got {num_prefetch_batches}.")
+
         self.original_dataloader = dataloader
         self.device = device
+        self.augment = augment
+        # Keys of the tensor entries of a batch before and after the lr/hr split, captured from the first batch
+        self.tensor_keys = None
+        self.output_tensor_keys = None
+
+        # Ring of (batch_data, event) pairs, oldest first
+        self.batches = collections.deque()
+        self.streams = [torch.cuda.Stream() for _ in range(num_prefetch_batches)]
+        self.stream_index = 0
 
         self.data = iter(dataloader)
-        self.stream = torch.cuda.Stream()
         self.preload()
 
     def preload(self):
-        try:
-            self.batch_data = next(self.data)
-        except StopIteration:
-            self.batch_data = None
-            return None
+        while len(self.batches) < len(self.streams):
+            try:
+                batch_data = next(self.data)
+            except StopIteration:
+                return None
+
+            # Round-robin over the streams, the batch previously copied on this stream has already been consumed
+            stream = self.streams[self.stream_index]
+            self.stream_index = (self.stream_index + 1) % len(self.streams)
+
+            # Batches are dicts of tensors, which the dataloader pins by default
+            with torch.cuda.stream(stream):
+                # Every batch has the same layout, so the tensor entries are only looked up once
+                if self.tensor_keys is None:
+                    self.tensor_keys = tuple(k for k, v in batch_data.items() if torch.is_tensor(v))
+
+                for k in self.tensor_keys:
+                    # Copy uint8 data and scale it on the GPU, a quarter of the float32 transfer
+                    batch_data[k] = _to_float_tensor(batch_data[k].to(self.device, non_blocking=True))
 
-        with torch.cuda.stream(self.stream):
-            for k, v in self.batch_data.items():
-                if torch.is_tensor(v):
-                    self.batch_data[k] = self.batch_data[k].to(self.device, non_blocking=True)
+                # One copy for `paired_collate` batches, reassign the lr/hr views afterwards
+                batch_data = _split_paired_batch(batch_data)
+
+                if self.augment:
+                    batch_data["lr"], batch_data["hr"] = imgproc.random_rotate_flip_batch(batch_data["lr"], batch_data["hr"])
+
+                if self.output_tensor_keys is None:
+                    self.output_tensor_keys = tuple(k for k, v in batch_data.items() if torch.is_tensor(v))
+
+                event = stream.record_event()
+
+            self.batches.append((batch_data, event))
 
     def next(self):
-        torch.cuda.current_stream().wait_stream(self.stream)
-        batch_data = self.batch_data
+        if not self.batches:
+            return None
+
+        batch_data, event = self.batches.popleft()
+        current_stream = torch.cuda.current_stream()
+        current_stream.wait_event(event)
+        # The tensors were allocated on a side stream, keep the allocator from reusing them too early
+        for k in self.output_tensor_keys:
+            batch_data[k].record_stream(current_stream)
+
         self.preload()
         return batch_data
 
     def reset(self):
+        self.batches.clear()
+        # Only the iterator is rebuilt, persistent dataloader workers are reused
         self.data = iter(self.original_dataloader)
         self.preload()
 
@@ -25,6 +25,7 @@ __all__ = [
     "image2tensor", "tensor2image",
     "rgb2ycbcr", "bgr2ycbcr", "ycbcr2bgr", "ycbcr2rgb",
     "center_crop", "random_crop", "random_rotate", "random_horizontally_flip", "random_vertically_flip",
+    "random_rotate_flip_batch",
 ]
 
 
@@ -376,13 +377,14 @@ def center_crop(lr_image: np.ndarray, hr_image: np.ndarray, image_size: int) ->
     return patch_lr_image, patch_hr_image
 
 
-def random_crop(lr_image: np.ndarray, hr_image: np.ndarray, image_size: int) -> [np.ndarray, np.ndarray]:
+def random_crop(lr_image: np.ndarray, hr_image: np.ndarray, image_size: int, rng: np.random.Generator = None) -> [np.ndarray, np.ndarray]:
     """Crop small image patches from one image.
 
     Args:
         lr_image (np.ndarray): The input low-resolution image for `OpenCV.imread`.
         hr_image (np.ndarray): The input high-resolution image for `OpenCV.imread`.
         image_size (int): The size of the captured image area.
+        rng (optional, np.random.Generator): Random number generator, uses the `random` module if None. Default: ``None``.
 
     Returns:
         np.ndarray: Small patch images.
@@ -391,8 +393,12 @@ def random_crop(lr_image: np.ndarray, hr_image: np.ndarray, image_size: int) ->
     image_height, image_width = lr_image.shape[:2]
 
     # Just need to find the top and left coordinates of the image
-    top = random.randint(0, image_height - image_size)
-    left = random.randint(0, image_width - image_size)
+    if rng is None:
+        top = random.randint(0, image_height - image_size)
+        left = random.randint(0, image_width - image_size)
+    else:
+        top = int(rng.integers(0, image_height - image_size + 1))
+        left = int(rng.integers(0, image_width - image_size + 1))
 
     # Crop image patch
     patch_lr_image = lr_image[top:top + image_size, left:left + image_size, ...]
@@ -465,3 +471,31 @@ def random_vertically_flip(lr_image: np.ndarray, hr_image: np.ndarray, p=0.5) ->
         hr_image = cv2.flip(hr_image, 0)
 
     return lr_image, hr_image
+
+
+def random_rotate_flip_batch(lr_tensor: torch.Tensor, hr_tensor: torch.Tensor) -> [torch.Tensor, torch.Tensor]:
+    """Randomly rotate by multiples of 90 degrees and flip a batch of square image patches, independently per sample.
+
+    A random transpose followed by a random horizontal and vertical flip, each with probability 0.5, picks one of the
+    eight symmetries of the square uniformly. That is the same distribution as `random_rotate` with
+    ``angles=[0, 90, 180, 270]`` followed by `random_horizontally_flip` and `random_vertically_flip`.
+
+    Args:
+        lr_tensor (torch.Tensor): The input low-resolution image batch with shape (b, c, h, h).
+        hr_tensor (torch.Tensor): The input high-resolution image batch with shape (b, c, h, h).
+
+    Returns:
+        torch.Tensor: Rotated and flipped image batches.
+    """
+
+    # One decision per sample and per operation, shared by the lr and hr patches of that sample
+    masks = torch.rand(3, lr_tensor.size(0), 1, 1, 1, device=lr_tensor.device) < 0.5
+
+    lr_tensor = torch.where(masks[0], lr_tensor.transpose(-1, -2), lr_tensor)
+    hr_tensor = torch.where(masks[0], hr_tensor.transpose(-1, -2), hr_tensor)
+    lr_tensor = torch.where(masks[1], lr_tensor.flip(-1), lr_tensor)
+    hr_tensor = torch.where(masks[1], hr_tensor.flip(-1), hr_tensor)
+    lr_tensor = torch.where(masks[2], lr_tensor.flip(-2), lr_tensor)
+    hr_tensor = torch.where(masks[2], hr_tensor.flip(-2), hr_tensor)
+
+    return lr_tensor, hr_tensor
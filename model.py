@@ -102,12 +102,8 @@ if __name__ == '__main__':
     device = torch.device("cuda" if args.cuda else "cpu")
     print("Device used: ", device, "\n")
 
+    # TF32 is enabled in `config.py`
     if torch.cuda.is_available():
-        torch.backends.cuda.matmul.allow_tf32 = True
-
-        # The flag below controls whether to allow TF32 on cuDNN. This flag defaults to True.
-        torch.backends.cudnn.allow_tf32 = True
-
         torch.backends.cuda.matmul.allow_fp16_reduced_precision_reduction = True
 
     kwargs = {'num_workers': 1, 'pin_memory': True} if args.cuda else {}
@@ -130,7 +126,7 @@ if __name__ == '__main__':
     print("Load train dataset and valid dataset successfully.")
 
     # Creating the model
-    model = VDSR().to(config.device)
+    model = VDSR().to(config.device, memory_format=torch.channels_last)
     print("Build VDSR model successfully.")
 
     # Defining the loss function
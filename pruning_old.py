@@ -93,7 +93,7 @@ if __name__ == '__main__':
     print("Load train dataset and valid dataset successfully.")
 
     # Creating the unpruned model
-    model = VDSR().to(config.device)
+    model = VDSR().to(config.device, memory_format=torch.channels_last)
     print("Build VDSR model successfully.\n")
     print("ORIGINAL UN-PRUNED MODEL: \n", model, "\n\n")
 
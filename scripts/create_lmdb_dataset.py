@@ -0,0 +1,91 @@
+# Copyright 2022 Dakewe Biotech Corporation. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+import argparse
+import os
+
+import cv2
+import lmdb
+import numpy as np
+from tqdm import tqdm
+
+
+def main(args) -> None:
+    # The lr and hr images of one sample share the same file name
+    image_file_names = sorted(os.listdir(f"{args.images_dir}/hr"))
+
+    write_lmdb(args.lr_lmdb_path, [f"{args.images_dir}/lr/{x}" for x in image_file_names], args.image_size, "Create lr lmdb")
+    write_lmdb(args.hr_lmdb_path, [f"{args.images_dir}/hr/{x}" for x in image_file_names], args.image_size, "Create hr lmdb")
+
+
+def write_lmdb(lmdb_path: str, image_file_paths: list, image_size: int, desc: str) -> None:
+    # Every tile takes image_size * image_size bytes, leave plenty of room for the lmdb pages
+    map_size = max(len(image_file_paths) * image_size * image_size * 10, 1 << 30)
+    env = lmdb.open(lmdb_path, map_size=map_size)
+
+    txn = env.begin(write=True)
+    progress_bar = tqdm(enumerate(image_file_paths), total=len(image_file_paths), unit="image", desc=desc)
+    for index, image_file_path in progress_bar:
+        y_image = read_y_image(image_file_path, image_size)
+        txn.put(f"{index:08d}".encode("ascii"), y_image.tobytes())
+
+        # Commit regularly so the transaction does not grow unbounded
+        if (index + 1) % 10000 == 0:
+            txn.commit()
+            txn = env.begin(write=True)
+
+    txn.put(b"__len__", str(len(image_file_paths)).encode("ascii"))
+    txn.put(b"__image_size__", str(image_size).encode("ascii"))
+    txn.commit()
+
+    env.sync()
+    env.close()
+
+
+def read_y_image(image_file_path: str, image_size: int) -> np.ndarray:
+    # Same as the in-memory dataset: the JPEG luma plane is not the luma of the clamped BGR decode, so JPEG
+    # images are decoded in colour, lossless formats only decode the luma. This also covers single-channel images
+    is_jpeg = os.path.splitext(image_file_path)[1].lower() in (".jpg", ".jpeg")
+    image = cv2.imread(image_file_path, cv2.IMREAD_COLOR if is_jpeg else cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Can not read image `{image_file_path}`.")
+
+    image_height, image_width = image.shape[:2]
+    if image_height < image_size or image_width < image_size:
+        raise ValueError(f"`{image_file_path}` with shape {image.shape} is smaller than `--image_size` {image_size}.")
+
+    # Center crop to the training patch size
+    top = (image_height - image_size) // 2
+    left = (image_width - image_size) // 2
+    image = image[top:top + image_size, left:left + image_size]
+
+    # `imgproc.bgr2ycbcr(..., use_y_channel=True)` Y channel, kept in [0, 255]. Full range BT.601 luma
+    # scaled by 219 / 255 and offset by 16 gives the same coefficients
+    if is_jpeg:
+        y_image = np.rint(np.dot(image.astype(np.float32), [24.966 / 255., 128.553 / 255., 65.481 / 255.]) + 16.)
+    else:
+        y_image = np.rint(image.astype(np.float32) * (219. / 255.) + 16.)
+    y_image = np.ascontiguousarray(np.clip(y_image, 0, 255).astype(np.uint8))
+
+    return y_image
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create lmdb dataset scripts.")
+    parser.add_argument("--images_dir", type=str, help="Path to the prepared image directory, containing `lr` and `hr` folders.")
+    parser.add_argument("--lr_lmdb_path", type=str, help="Path to the low-resolution lmdb database.")
+    parser.add_argument("--hr_lmdb_path", type=str, help="Path to the high-resolution lmdb database.")
+    parser.add_argument("--image_size", type=int, help="Size of the stored Y channel tiles.")
+    args = parser.parse_args()
+
+    main(args)
@@ -23,41 +23,63 @@ from torch.optim import lr_scheduler
 from torch.utils.data import DataLoader
 
 import config
-from dataset import CUDAPrefetcher
-from dataset import TrainValidImageDataset, TestImageDataset
+from dataset import CUDAPrefetcher, paired_collate, seed_worker
+from dataset import TrainValidImageDataset, LMDBImageDataset, TestImageDataset
 
 
 def load_dataset(batch_size) -> [DataLoader, DataLoader]:
     # Load train, test and valid datasets
-    train_datasets = TrainValidImageDataset(config.train_image_dir, config.image_size, "Train")
-    valid_datasets = TrainValidImageDataset(config.valid_image_dir, config.image_size, "Valid")
-    test_datasets = TestImageDataset(config.test_image_dir, config.upscale_factor)
+    if config.train_lr_lmdb_path and config.train_hr_lmdb_path:
+        train_datasets = LMDBImageDataset(config.train_lr_lmdb_path, config.train_hr_lmdb_path, config.image_size, "Train")
+    else:
+        train_datasets = TrainValidImageDataset(config.train_image_dir, config.image_size, "Train", config.use_dali)
+    if config.valid_lr_lmdb_path and config.valid_hr_lmdb_path:
+        valid_datasets = LMDBImageDataset(config.valid_lr_lmdb_path, config.valid_hr_lmdb_path, config.image_size, "Valid")
+    else:
+        valid_datasets = TrainValidImageDataset(config.valid_image_dir, config.image_size, "Valid", config.use_dali)
+    test_datasets = TestImageDataset(config.test_image_dir, config.upscale_factor, config.test_matlab_imresize)
+
+    # Seeds the dataloader workers, reproducible through the global torch seed set in `config`
+    generator = torch.Generator()
+    generator.manual_seed(torch.initial_seed())
 
-    # Generator all dataloader
+    # Generator all dataloader. The workers are persistent, so they are forked once and survive every epoch
     train_dataloader = DataLoader(train_datasets,
                                   batch_size=batch_size,
                                   shuffle=True,
                                   num_workers=config.num_workers,
                                   pin_memory=True,
+                                  prefetch_factor=config.prefetch_factor,
                                   drop_last=True,
-                                  persistent_workers=True)
+                                  persistent_workers=True,
+                                  collate_fn=paired_collate,
+                                  worker_init_fn=seed_worker,
+                                  generator=generator)
     valid_dataloader = DataLoader(valid_datasets,
                                   batch_size=batch_size,
                                   shuffle=False,
                                   num_workers=config.num_workers,
                                   pin_memory=True,
+                                  prefetch_factor=config.prefetch_factor,
                                   drop_last=False,
-                                  persistent_workers=True)
+                                  persistent_workers=True,
+                                  collate_fn=paired_collate,
+                                  worker_init_fn=seed_worker,
+                                  generator=generator)
     test_dataloader = DataLoader(test_datasets,
                                  batch_size=1,
                                  shuffle=False,
                                  num_workers=1,
                                  pin_memory=True,
+                                 prefetch_factor=config.prefetch_factor,
                                  drop_last=False,
-                                 persistent_workers=False)
+                                 persistent_workers=True,
+                                 collate_fn=paired_collate,
+                                 worker_init_fn=seed_worker,
+                                 generator=generator)
 
     # Place all data on the preprocessing data loader
-    train_prefetcher = CUDAPrefetcher(train_dataloader, config.device)
+    train_prefetcher = CUDAPrefetcher(train_dataloader, config.device, augment=True)
     valid_prefetcher = CUDAPrefetcher(valid_dataloader, config.device)
     test_prefetcher = CUDAPrefetcher(test_dataloader, config.device)
 